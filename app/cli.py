@@ -5,6 +5,8 @@ This CLI allows users to query their notes, retrieve relevant chunks,
 and get AI-powered analysis using Gemini.
 """
 
+import functools
+import os
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -12,10 +14,10 @@ import re
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config.settings import PROMPTS_DIR, RESPONSES_DIR
+from config.settings import PROMPTS_DIR, RESPONSES_DIR, TOP_K
 from config.api_keys import GEMINI_API_KEY
 from scripts.retrieve import Retriever
-import google.generativeai as genai
+from scripts.response_cache import SemanticResponseCache
 
 
 class RAGSystem:
@@ -23,31 +25,52 @@ class RAGSystem:
     Main RAG system class that combines retrieval and generation.
     """
     
+    # Prompt template file for each mode
+    PROMPT_FILES = {
+        'analysis': 'analysis.txt',
+        'summary': 'summary.txt',
+        'patterns': 'patterns.txt'
+    }
+    
+    # Characters stripped from queries when building filenames
+    _SLUG_RE = re.compile(r'[^\w\s]')
+    
     def __init__(self):
-        """Initialize RAG system with retriever and Gemini client."""
+        """Initialize RAG system; Gemini and prompts load on first query."""
         print("Initializing RAG system...")
         
         # Initialize retriever
         self.retriever = Retriever()
         
-        # Initialize Gemini
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        # Cache of previous responses, matched by query similarity
+        self.response_cache = SemanticResponseCache()
         
-        # Load prompts
-        self.analysis_prompt_template = self._load_prompt('analysis.txt')
-        self.summary_prompt_template = self._load_prompt('summary.txt')
-        self.patterns_prompt_template = self._load_prompt('patterns.txt')
+        # Gemini client and prompt templates, loaded on first use
+        self._model = None
+        self._prompt_templates = {}
         
         print("RAG system ready!\n")
     
-    def _load_prompt(self, filename):
-        """Load prompt template from file."""
-        prompt_path = PROMPTS_DIR / filename
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+    @property
+    def model(self):
+        """Gemini model, imported and configured on first access."""
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            self._model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        return self._model
     
-    def _timestamp_to_readable(self, timestamp):
+    def _load_prompt(self, mode):
+        """Load the prompt template for a mode, reading the file on first use."""
+        filename = self.PROMPT_FILES.get(mode, self.PROMPT_FILES['analysis'])
+        if filename not in self._prompt_templates:
+            prompt_path = PROMPTS_DIR / filename
+            self._prompt_templates[filename] = prompt_path.read_text(encoding='utf-8')
+        return self._prompt_templates[filename]
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _timestamp_to_readable(timestamp):
         """
         Convert timestamp to readable date format.
         
@@ -96,18 +119,19 @@ class RAGSystem:
             formatted.append(note_text)
         return "\n\n".join(formatted)
     
-    def _build_prompt(self, template, query, chunks):
+    def _build_prompt(self, mode, query, chunks):
         """
-        Build prompt from template with query and retrieved chunks.
+        Build prompt from the mode's template with query and retrieved chunks.
         
         Args:
-            template: Prompt template string
+            mode: 'analysis', 'summary', or 'patterns'
             query: User query
             chunks: Retrieved chunks
             
         Returns:
             Formatted prompt string
         """
+        template = self._load_prompt(mode)
         retrieved_notes = self._format_retrieved_notes(chunks)
         return template.format(
             retrieved_notes=retrieved_notes,
@@ -126,7 +150,7 @@ class RAGSystem:
             Filename string
         """
         # Extract first few meaningful words from query
-        query_words = re.sub(r'[^\w\s]', '', query.lower())
+        query_words = self._SLUG_RE.sub('', query.lower())
         query_words = query_words.split()[:5]  # Take first 5 words
         query_slug = '_'.join(query_words)
         
@@ -142,6 +166,10 @@ class RAGSystem:
         
         return f"{query_slug}_{timestamp}.md"
     
+    def _response_header(self, query):
+        """Markdown header placed above every saved response."""
+        return f"# Query\n\n{query}\n\n---\n\n"
+    
     def _save_response(self, query, response_text, filename):
         """
         Save response to a markdown file with query at the top.
@@ -157,14 +185,77 @@ class RAGSystem:
         filepath = RESPONSES_DIR / filename
         
         # Format content with query at the top
-        content = f"# Query\n\n{query}\n\n---\n\n{response_text}"
+        content = self._response_header(query) + response_text
         
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(content)
+            # Make sure the saved response survives a crash or power loss
+            f.flush()
+            os.fsync(f.fileno())
         
         return filepath
     
-    def query(self, user_query, mode='analysis', top_k=10):
+    def _stream_response(self, query, prompt):
+        """
+        Stream a Gemini response to stdout and to its markdown file as it arrives.
+        
+        Args:
+            query: User query string
+            prompt: Prompt to send to Gemini
+            
+        Returns:
+            Tuple of (response_text, saved_filepath)
+            
+        Raises:
+            ValueError: If the stream ended without any text
+        """
+        response_stream = self.model.generate_content(prompt, stream=True)
+        pieces = []
+        filepath = None
+        f = None
+        
+        try:
+            for event in response_stream:
+                # Chunks carrying only finish_reason or usage data have no
+                # parts, and reading .text on them raises
+                if not event.candidates or not event.candidates[0].content.parts:
+                    continue
+                text = event.text
+                if not text:
+                    continue
+                
+                # Name and open the file once the first token arrives
+                if f is None:
+                    filepath = RESPONSES_DIR / self._generate_filename(query, text)
+                    f = open(filepath, 'w', encoding='utf-8')
+                    f.write(self._response_header(query))
+                
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                f.write(text)
+                pieces.append(text)
+            
+            if f is None:
+                raise ValueError("Gemini returned an empty response")
+            
+            # Make sure the saved response survives a crash or power loss
+            f.flush()
+            os.fsync(f.fileno())
+        except Exception:
+            # Don't leave a truncated response behind
+            if f is not None:
+                f.close()
+                f = None
+                filepath.unlink(missing_ok=True)
+            raise
+        finally:
+            if f is not None:
+                f.close()
+        
+        print("\n")
+        return ''.join(pieces), filepath
+    
+    def query(self, user_query, mode='analysis', top_k=TOP_K, stream=False):
         """
         Process a user query: retrieve relevant chunks and generate response.
         
@@ -172,48 +263,65 @@ class RAGSystem:
             user_query: User's question or query
             mode: 'analysis', 'summary', or 'patterns'
             top_k: Number of chunks to retrieve
+            stream: Print the response to stdout as it is generated; cached
+                responses and errors are printed too, so callers need not
+                print the returned text
             
         Returns:
             Tuple of (response_text, saved_filepath)
         """
         print(f"Query: {user_query}\n")
+        
+        # Embed once; the embedding is shared by the cache lookup and retrieval
+        query_embedding = self.retriever.embed_query(user_query)
+        
+        # Reuse a previous response to a near-identical query
+        cached = self.response_cache.lookup(query_embedding, mode, top_k)
+        if cached:
+            print("Using cached response for a similar query\n")
+            if stream:
+                print(cached[0])
+            return cached
+        
         print(f"Retrieving top {top_k} relevant chunks...")
         
         # Retrieve relevant chunks
-        chunks = self.retriever.retrieve(user_query, top_k)
+        chunks = self.retriever.retrieve(user_query, top_k, query_embedding)
         
         if not chunks:
+            if stream:
+                print("No relevant notes found.")
             return "No relevant notes found.", None
         
         print(f"Retrieved {len(chunks)} chunks\n")
         
-        # Select prompt template based on mode
-        if mode == 'analysis':
-            template = self.analysis_prompt_template
-        elif mode == 'summary':
-            template = self.summary_prompt_template
-        elif mode == 'patterns':
-            template = self.patterns_prompt_template
-        else:
-            template = self.analysis_prompt_template
-        
-        # Build prompt
-        prompt = self._build_prompt(template, user_query, chunks)
+        # Build prompt from the template for this mode
+        prompt = self._build_prompt(mode, user_query, chunks)
         
         # Generate response with Gemini
         print("Generating response with Gemini...\n")
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text
+            if stream:
+                response_text, saved_path = self._stream_response(user_query, prompt)
+            else:
+                response = self.model.generate_content(prompt)
+                response_text = response.text
+                
+                # Save response
+                filename = self._generate_filename(user_query, response_text)
+                saved_path = self._save_response(user_query, response_text, filename)
             
-            # Save response
-            filename = self._generate_filename(user_query, response_text)
-            saved_path = self._save_response(user_query, response_text, filename)
-            print(f"Response saved to: {saved_path}\n")
+            if saved_path:
+                print(f"Response saved to: {saved_path}\n")
+                self.response_cache.add(
+                    query_embedding, mode, top_k, response_text, saved_path
+                )
             
             return response_text, saved_path
         except Exception as e:
             error_msg = f"Error generating response: {str(e)}"
+            if stream:
+                print(error_msg)
             return error_msg, None
 
 
@@ -262,8 +370,8 @@ def main():
                 
                 # Process query
                 print("\n" + "=" * 70)
-                response, saved_path = rag.query(user_input, mode=current_mode)
-                print(response)
+                # Response is printed as it streams in
+                rag.query(user_input, mode=current_mode, stream=True)
                 print("=" * 70 + "\n")
                 
             except KeyboardInterrupt:
@@ -5,6 +5,7 @@ This file contains all configuration parameters for the system including
 paths, model names, and processing parameters.
 """
 
+import os
 from pathlib import Path
 
 # Base directory for the project
@@ -21,19 +22,59 @@ RESPONSES_DIR = BASE_DIR / "responses"
 CSV_FILE = DATA_DIR / "all_notes.csv"
 CHUNKED_NOTES_FILE = PROCESSED_DIR / "chunked_notes.json"
 FAISS_INDEX_FILE = EMBEDDINGS_DIR / "faiss_index"
-CHUNK_METADATA_FILE = EMBEDDINGS_DIR / "chunk_metadata.json"
+EMBEDDING_VECTORS_FILE = EMBEDDINGS_DIR / "vecs.fp16.npy"  # Raw vectors for flat indexes
+CHUNK_METADATA_DB = EMBEDDINGS_DIR / "chunk_metadata.sqlite"
+QUERY_CACHE_FILE = EMBEDDINGS_DIR / "query_cache.sqlite"
+RESPONSE_CACHE_DIR = RESPONSES_DIR / ".semcache"
 
 # Embedding model configuration
 # Using sentence-transformers for local embeddings
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Fast and efficient model
 EMBEDDING_DIMENSION = 384  # Dimension for all-MiniLM-L6-v2
+EMBEDDING_BATCH_SIZE = 128  # Chunks per forward pass when building the index
+EMBEDDING_MAX_SEQ_LENGTH = 256  # Token limit used by all-MiniLM-L6-v2
+
+# ONNX Runtime backend
+# Set USE_ONNX=1 to embed with an INT8-quantized ONNX export of the model
+# instead of PyTorch. Create the export once with scripts/export_onnx.py.
+USE_ONNX = os.getenv("USE_ONNX", "0") == "1"
+ONNX_MODEL_DIR = EMBEDDINGS_DIR / "onnx"
+ONNX_MODEL_FILE = ONNX_MODEL_DIR / "model.int8.onnx"
 
 # Chunking configuration
-CHUNK_SIZE = 512  # Characters per chunk
-CHUNK_OVERLAP = 50  # Overlap between chunks
+# Chunks are packed from whole sentences, so CHUNK_SIZE is a maximum
+CHUNK_SIZE = 512  # Maximum characters per chunk
+CHUNK_OVERLAP = 50  # Maximum overlap characters, trimmed to whole words
 
 # Retrieval configuration
-TOP_K = 10  # Number of chunks to retrieve for each query
+TOP_K = 7  # Number of chunks to retrieve for each query
+QUERY_CACHE_MAX_ENTRIES = 10000  # Cached query embeddings kept on disk (LRU)
+QUERY_BATCH_SIZE = 64  # Queries per forward pass in Retriever.retrieve_batch
+
+# Response cache configuration
+# A new query reuses a saved Gemini response when its embedding is at least
+# this similar (cosine) to a previous query asked in the same mode
+RESPONSE_CACHE_THRESHOLD = 0.95
+RESPONSE_CACHE_TTL_DAYS = 7  # Cached responses older than this are ignored
+
+# FAISS index configuration
+# Embeddings are L2-normalized, so inner product equals cosine similarity.
+# Below HNSW_MIN_VECTORS an exact IndexFlatIP is fast enough and avoids
+# the graph build cost.
+HNSW_MIN_VECTORS = 10000
+HNSW_M = 32  # Neighbours per node in the HNSW graph
+HNSW_EF_CONSTRUCTION = 200  # Build-time search depth (higher = better graph)
+HNSW_EF_SEARCH = 64  # Query-time search depth (higher = better recall)
+
+# Product quantization (IVF-PQ) for large collections
+# When enabled, collections above PQ_MIN_VECTORS are compressed to
+# PQ_M bytes per vector and searched through inverted lists. This cuts
+# index memory ~32x at the cost of some recall.
+FAISS_USE_PQ = False
+PQ_MIN_VECTORS = 5000
+PQ_M = 48  # Sub-quantizers; must divide EMBEDDING_DIMENSION
+PQ_NBITS = 8  # Bits per sub-quantizer code
+IVF_NPROBE = 16  # Inverted lists visited per query
 
 # Ensure directories exist
 DATA_DIR.mkdir(exist_ok=True)
@@ -41,4 +82,5 @@ PROCESSED_DIR.mkdir(exist_ok=True)
 EMBEDDINGS_DIR.mkdir(exist_ok=True)
 PROMPTS_DIR.mkdir(exist_ok=True)
 RESPONSES_DIR.mkdir(exist_ok=True)
+RESPONSE_CACHE_DIR.mkdir(exist_ok=True)
 
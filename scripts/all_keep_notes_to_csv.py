@@ -1,29 +1,51 @@
-import os, json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import orjson
 import pandas as pd
 
 # this finds our json files
 path_to_json = "data/keep_json/"
-json_files = [
-    pos_json for pos_json in os.listdir(path_to_json) if pos_json.endswith(".json")
-]
 
-jsons_data = pd.DataFrame(columns=["text", "created_at", "modified_at"])
 
-for index, js in enumerate(json_files):
+def parse_one(path):
+    """Parse a single Keep JSON file into a row dict, or None if it has no text."""
+    with open(path, "rb") as json_file:
+        json_text = orjson.loads(json_file.read())
+
+    # here you need to know the layout of your json and each json has to have
+    # the same structure (obviously not the structure I have here)
     try:
-        with open(os.path.join(path_to_json, js)) as json_file:
-            json_text = json.load(json_file)
-
-            # here you need to know the layout of your json and each json has to have
-            # the same structure (obviously not the structure I have here)
-            text = json_text["textContent"]
-            created_at = json_text["createdTimestampUsec"]
-            modified_at = json_text["userEditedTimestampUsec"]
-            # here I push a list of data into a pandas DataFrame at row given by 'index'
-            jsons_data.loc[index] = [text, created_at, modified_at]
-            print(jsons_data)
+        return {
+            "text": json_text["textContent"],
+            "created_at": json_text["createdTimestampUsec"],
+            "modified_at": json_text["userEditedTimestampUsec"],
+        }
     except KeyError:
-        print("Empty Note:", json_text, "File is:", json_file)
+        print("Empty Note:", json_text, "File is:", path)
+        return None
+
+
+if __name__ == "__main__":
+    paths = [
+        os.path.join(path_to_json, pos_json)
+        for pos_json in os.listdir(path_to_json)
+        if pos_json.endswith(".json")
+    ]
+
+    # parsing is independent per file, so spread it across all cores;
+    # chunksize amortizes the IPC cost of many small files
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        records = [r for r in ex.map(parse_one, paths, chunksize=64) if r]
 
-sorted_notes = jsons_data.sort_values(by="created_at", ascending=False)
-sorted_notes.to_csv("data/all_notes.csv", index=True)
+    jsons_data = pd.DataFrame.from_records(
+        records, columns=["text", "created_at", "modified_at"]
+    )
+    # sort newest first on integer timestamps rather than object-dtype values;
+    # notes with a non-numeric timestamp are kept and sorted last
+    created_at = pd.to_numeric(jsons_data["created_at"], errors="coerce")
+    order = np.argsort(-created_at.to_numpy(dtype="float64", na_value=np.nan))
+    jsons_data["created_at"] = created_at.astype("Int64")
+    sorted_notes = jsons_data.iloc[order]
+    sorted_notes.to_csv("data/all_notes.csv", index=True)
@@ -5,8 +5,9 @@ This script uses sentence-transformers to generate embeddings locally,
 then creates a FAISS index for fast similarity search.
 """
 
-import json
+import sqlite3
 import numpy as np
+import orjson
 import faiss
 from pathlib import Path
 import sys
@@ -16,13 +17,101 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.settings import (
     CHUNKED_NOTES_FILE,
     FAISS_INDEX_FILE,
-    CHUNK_METADATA_FILE,
-    EMBEDDING_MODEL_NAME,
-    EMBEDDING_DIMENSION
+    EMBEDDING_VECTORS_FILE,
+    CHUNK_METADATA_DB,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_BATCH_SIZE,
+    HNSW_MIN_VECTORS,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    FAISS_USE_PQ,
+    PQ_MIN_VECTORS,
+    PQ_M,
+    PQ_NBITS,
+    USE_ONNX
 )
 
-# Import sentence-transformers for local embedding generation
-from sentence_transformers import SentenceTransformer
+from scripts.embedding_model import load_embedding_model
+
+
+def build_index(embeddings):
+    """
+    Build a FAISS index suited to the size of the collection.
+    
+    Args:
+        embeddings: L2-normalized float32 array of shape (N, dimension)
+        
+    Returns:
+        Populated FAISS index using inner-product (cosine) similarity
+    """
+    n, dimension = embeddings.shape
+    
+    if FAISS_USE_PQ and n > PQ_MIN_VECTORS:
+        # Compressed vectors with inverted-list pruning for large collections
+        nlist = int(4 * np.sqrt(n))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, nlist, PQ_M, PQ_NBITS,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        print(f"Training IVF-PQ index ({nlist} lists)...")
+        index.train(embeddings)
+    elif n >= HNSW_MIN_VECTORS:
+        # Approximate graph search for large collections
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        # Exact search is fast enough for small collections
+        index = faiss.IndexFlatIP(dimension)
+    
+    index.add(embeddings)
+    return index
+
+
+def _to_timestamp(value):
+    """
+    Normalize a timestamp to an int, or None if missing or unparseable.
+    
+    pandas reads timestamp columns with any missing value as float64, so
+    values like 1695568426471000.0 are converted back to integers here.
+    """
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+
+def save_metadata(metadata):
+    """
+    Write chunk metadata to a fresh SQLite database keyed by FAISS id.
+    
+    Args:
+        metadata: List of (faiss_id, chunk_id, original_index, text,
+            created_at, modified_at) tuples
+    """
+    CHUNK_METADATA_DB.unlink(missing_ok=True)
+    
+    conn = sqlite3.connect(str(CHUNK_METADATA_DB))
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Sync the WAL on every commit so a finished build is durable
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            "CREATE TABLE meta ("
+            "faiss_id INTEGER PRIMARY KEY, chunk_id INT, original_index INT, "
+            "text TEXT, created_at INTEGER, modified_at INTEGER)"
+        )
+        conn.executemany("INSERT INTO meta VALUES (?, ?, ?, ?, ?, ?)", metadata)
+        conn.commit()
+        # Fold the WAL back into the database file so readers open a single file
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
 
 
 def generate_embeddings():
@@ -40,62 +129,69 @@ def generate_embeddings():
             "Please run chunk_notes.py first."
         )
     
-    with open(CHUNKED_NOTES_FILE, 'r', encoding='utf-8') as f:
-        chunks = json.load(f)
+    with open(CHUNKED_NOTES_FILE, 'rb') as f:
+        chunks = orjson.loads(f.read())
     
     print(f"Loaded {len(chunks)} chunks")
     
-    # Load sentence-transformers model locally
-    print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
-    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    # Load embedding model locally
+    if USE_ONNX:
+        model = load_embedding_model()
+    else:
+        import torch
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        model = load_embedding_model(device)
+        if device == 'cuda':
+            # FP16 halves memory traffic on GPU with negligible quality loss
+            model.half()
     
     # Extract texts for embedding
     texts = [chunk['text'] for chunk in chunks]
     
-    # Generate embeddings in batches for efficiency
+    # Generate embeddings; the model batches internally and sorts by length
+    # to minimise padding, and normalizes so inner product is cosine similarity
     print("Generating embeddings...")
-    batch_size = 32
-    embeddings_list = []
-    
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i:i + batch_size]
-        batch_embeddings = model.encode(batch_texts, show_progress_bar=False)
-        embeddings_list.append(batch_embeddings)
-        if (i + batch_size) % 100 == 0:
-            print(f"Processed {min(i + batch_size, len(texts))} / {len(texts)} chunks")
-    
-    # Concatenate all embeddings
-    embeddings = np.vstack(embeddings_list).astype('float32')
+    embeddings = model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    ).astype('float32')
     print(f"Generated embeddings of shape: {embeddings.shape}")
     
     # Create FAISS index
     print("Building FAISS index...")
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)  # L2 distance for similarity search
-    
-    # Add embeddings to index
-    index.add(embeddings)
+    index = build_index(embeddings)
     print(f"FAISS index built with {index.ntotal} vectors")
     
     # Save FAISS index
     print(f"Saving FAISS index to {FAISS_INDEX_FILE}...")
     faiss.write_index(index, str(FAISS_INDEX_FILE))
     
-    # Save metadata mapping (chunk_id -> metadata)
-    metadata = {
-        str(i): {
-            'chunk_id': chunk['chunk_id'],
-            'text': chunk['text'],
-            'original_index': chunk['original_index'],
-            'created_at': chunk.get('created_at'),
-            'modified_at': chunk.get('modified_at')
-        }
+    # Flat indexes are just the raw vectors, so also store them as a float16
+    # array the retriever can memory-map instead of deserializing the index
+    if isinstance(index, faiss.IndexFlat):
+        print(f"Saving float16 vectors to {EMBEDDING_VECTORS_FILE}...")
+        np.save(EMBEDDING_VECTORS_FILE, embeddings.astype('float16'))
+    else:
+        EMBEDDING_VECTORS_FILE.unlink(missing_ok=True)
+    
+    # Save metadata mapping (FAISS id -> metadata)
+    metadata = [
+        (
+            i,
+            chunk['chunk_id'],
+            chunk['original_index'],
+            chunk['text'],
+            _to_timestamp(chunk.get('created_at')),
+            _to_timestamp(chunk.get('modified_at'))
+        )
         for i, chunk in enumerate(chunks)
-    }
+    ]
     
-    print(f"Saving metadata to {CHUNK_METADATA_FILE}...")
-    with open(CHUNK_METADATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    print(f"Saving metadata to {CHUNK_METADATA_DB}...")
+    save_metadata(metadata)
     
     print("Embedding generation complete!")
     return index, metadata
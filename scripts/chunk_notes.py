@@ -5,7 +5,9 @@ This script splits notes into chunks of appropriate size for embedding
 generation, preserving metadata for each chunk.
 """
 
-import json
+import re
+import numpy as np
+import orjson
 from pathlib import Path
 import sys
 
@@ -15,14 +17,63 @@ from config.settings import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKED_NOTES_FILE
 from scripts.load_csv import load_notes
 
 
+# Sentence boundaries: whitespace following terminal punctuation
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_units(text, chunk_size):
+    """
+    Split text into sentences, breaking any sentence longer than a chunk
+    into words, and any word longer than a chunk into fixed-size pieces.
+    """
+    units = []
+    for sentence in _SENT_RE.split(text):
+        if len(sentence) <= chunk_size:
+            units.append(sentence)
+            continue
+        for word in sentence.split():
+            units.extend(word[i:i + chunk_size] for i in range(0, len(word), chunk_size))
+    return units
+
+
+def _overlap_tail(chunk, overlap):
+    """
+    Return at most the last `overlap` characters of a chunk, starting at a
+    sentence boundary if the tail contains one, otherwise at a word.
+    """
+    if overlap <= 0:
+        return ""
+    if len(chunk) <= overlap:
+        return chunk
+    
+    # Search from the character just before the tail, so a sentence that
+    # starts exactly at the tail boundary is kept whole; the lookbehind in
+    # _SENT_RE can see characters before the search position
+    start = len(chunk) - overlap
+    boundary = _SENT_RE.search(chunk, start - 1)
+    if boundary:
+        return chunk[boundary.end():]
+    
+    tail = chunk[start:]
+    if chunk[start - 1] != ' ':
+        # Drop the partial word at the start of the tail
+        space = tail.find(' ')
+        tail = tail[space + 1:] if space != -1 else ""
+    return tail
+
+
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     """
-    Split text into overlapping chunks.
+    Split text into overlapping chunks along sentence and word boundaries.
+    
+    Sentences are packed greedily into chunks of at most chunk_size
+    characters. Each new chunk starts with the last few words (up to
+    overlap characters) of the previous one.
     
     Args:
-        text: Text to chunk
+        text: Whitespace-normalized text to chunk
         chunk_size: Maximum characters per chunk
-        overlap: Number of characters to overlap between chunks
+        overlap: Maximum number of characters to overlap between chunks
         
     Returns:
         List of text chunks
@@ -31,20 +82,22 @@ def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
         return [text]
     
     chunks = []
-    start = 0
+    current = ""
     
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        
-        # Move start position with overlap
-        start = end - overlap
-        
-        # Prevent infinite loop
-        if start >= len(text):
-            break
+    for unit in _split_units(text, chunk_size):
+        if not current:
+            current = unit
+        elif len(current) + 1 + len(unit) <= chunk_size:
+            current += ' ' + unit
+        else:
+            chunks.append(current)
+            tail = _overlap_tail(current, overlap)
+            if tail and len(tail) + 1 + len(unit) <= chunk_size:
+                current = tail + ' ' + unit
+            else:
+                current = unit
     
+    chunks.append(current)
     return chunks
 
 
@@ -59,32 +112,34 @@ def chunk_notes():
     df = load_notes()
     
     print("Chunking notes...")
-    chunked_data = []
-    chunk_id = 0
+    notes = df[['text_clean', 'created_at', 'modified_at']].copy()
+    notes['chunks'] = notes['text_clean'].map(chunk_text)
+    notes['total_chunks'] = notes['chunks'].map(len)
+    notes['chunk_index'] = notes['chunks'].map(lambda chunks: list(range(len(chunks))))
     
-    for idx, row in df.iterrows():
-        text = row['text_clean']
-        chunks = chunk_text(text)
-        
-        for chunk_idx, chunk_content in enumerate(chunks):
-            chunk_dict = {
-                'chunk_id': chunk_id,
-                'original_index': int(idx),
-                'chunk_index': chunk_idx,
-                'text': chunk_content,
-                'created_at': row.get('created_at'),
-                'modified_at': row.get('modified_at'),
-                'total_chunks': len(chunks)
-            }
-            chunked_data.append(chunk_dict)
-            chunk_id += 1
+    # One row per chunk, keeping the note's original index
+    notes = (
+        notes.rename_axis('original_index')
+        .reset_index()
+        .explode(['chunks', 'chunk_index'], ignore_index=True)
+        .rename(columns={'chunks': 'text'})
+    )
+    notes['chunk_id'] = np.arange(len(notes))
+    
+    chunked_data = notes[[
+        'chunk_id', 'original_index', 'chunk_index', 'text',
+        'created_at', 'modified_at', 'total_chunks'
+    ]].to_dict('records')
     
     print(f"Created {len(chunked_data)} chunks from {len(df)} notes")
     
     # Save to JSON
     print(f"Saving chunked notes to {CHUNKED_NOTES_FILE}...")
-    with open(CHUNKED_NOTES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(chunked_data, f, indent=2, ensure_ascii=False)
+    with open(CHUNKED_NOTES_FILE, 'wb') as f:
+        f.write(orjson.dumps(
+            chunked_data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+        ))
     
     print("Chunking complete!")
     return chunked_data
@@ -0,0 +1,136 @@
+"""
+Load the embedding model used for indexing and retrieval.
+
+By default this is a sentence-transformers model running on PyTorch. When
+USE_ONNX is enabled, an INT8-quantized ONNX export of the same model is
+served through ONNX Runtime instead, behind the same encode() interface.
+"""
+
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MAX_SEQ_LENGTH,
+    USE_ONNX,
+    ONNX_MODEL_DIR,
+    ONNX_MODEL_FILE
+)
+
+
+class OnnxEncoder:
+    """
+    Minimal stand-in for SentenceTransformer backed by ONNX Runtime.
+    
+    Texts are tokenized with the exported Hugging Face tokenizer, run through
+    the quantized model on CPU, then mean-pooled over the attention mask.
+    """
+    
+    def __init__(self, model_file=ONNX_MODEL_FILE, tokenizer_dir=ONNX_MODEL_DIR,
+                 max_seq_length=EMBEDDING_MAX_SEQ_LENGTH):
+        """
+        Load the ONNX session and tokenizer.
+        
+        Args:
+            model_file: Path to the quantized ONNX model
+            tokenizer_dir: Directory containing the exported tokenizer
+            max_seq_length: Maximum tokens per text
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        if not Path(model_file).exists():
+            raise FileNotFoundError(
+                f"ONNX model not found: {model_file}\n"
+                "Please run export_onnx.py first."
+            )
+        
+        self.session = ort.InferenceSession(
+            str(model_file), providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(tokenizer_dir))
+        self.max_seq_length = max_seq_length
+    
+    def _encode_batch(self, texts):
+        """Embed one batch of texts with mean pooling."""
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors='np'
+        )
+        inputs = {
+            name: tokens[name].astype('int64')
+            for name in ('input_ids', 'attention_mask', 'token_type_ids')
+            if name in self.input_names and name in tokens
+        }
+        token_embeddings = self.session.run(None, inputs)[0]
+        
+        mask = tokens['attention_mask'][..., None].astype('float32')
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return summed / counts
+    
+    def encode(self, sentences, batch_size=32, show_progress_bar=False,
+               convert_to_numpy=True, normalize_embeddings=False):
+        """
+        Embed texts, mirroring SentenceTransformer.encode.
+        
+        Args:
+            sentences: List of texts
+            batch_size: Texts per forward pass
+            show_progress_bar: Print progress after each batch
+            convert_to_numpy: Accepted for compatibility; output is always numpy
+            normalize_embeddings: L2-normalize each embedding
+            
+        Returns:
+            float32 array of shape (len(sentences), dimension)
+        """
+        if len(sentences) == 0:
+            return np.empty((0, EMBEDDING_DIMENSION), dtype='float32')
+        
+        # Batch texts of similar length together to minimise padding
+        order = np.argsort([-len(text) for text in sentences], kind='stable')
+        sorted_texts = [sentences[i] for i in order]
+        
+        batches = []
+        for start in range(0, len(sorted_texts), batch_size):
+            batches.append(self._encode_batch(sorted_texts[start:start + batch_size]))
+            if show_progress_bar:
+                done = min(start + batch_size, len(sorted_texts))
+                print(f"Processed {done} / {len(sorted_texts)} texts")
+        
+        embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype='float32')
+        embeddings[order] = np.vstack(batches)
+        
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+        
+        return embeddings
+
+
+def load_embedding_model(device=None):
+    """
+    Load the configured embedding model.
+    
+    Args:
+        device: Torch device for the sentence-transformers model; ignored
+            by the ONNX backend, which always runs on CPU
+            
+    Returns:
+        Object with a SentenceTransformer-compatible encode() method
+    """
+    if USE_ONNX:
+        print(f"Loading ONNX embedding model: {ONNX_MODEL_FILE}...")
+        return OnnxEncoder()
+    
+    from sentence_transformers import SentenceTransformer
+    print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
+    return SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
@@ -0,0 +1,48 @@
+"""
+Export the embedding model to ONNX and quantize it to INT8.
+
+Run this once before setting USE_ONNX=1. The exported model and tokenizer
+are written to ONNX_MODEL_DIR. Requires the optional `optimum[onnxruntime]`
+dependency.
+"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, ONNX_MODEL_FILE
+
+
+def export_onnx():
+    """
+    Export the sentence-transformers model to ONNX and quantize it.
+    
+    Returns:
+        Path to the quantized ONNX model
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+    
+    model_id = f"sentence-transformers/{EMBEDDING_MODEL_NAME}"
+    
+    print(f"Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(ONNX_MODEL_DIR)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(ONNX_MODEL_DIR)
+    
+    print(f"Quantizing to INT8 at {ONNX_MODEL_FILE}...")
+    quantize_dynamic(
+        str(ONNX_MODEL_DIR / "model.onnx"),
+        str(ONNX_MODEL_FILE),
+        weight_type=QuantType.QInt8
+    )
+    
+    print("ONNX export complete!")
+    return ONNX_MODEL_FILE
+
+
+if __name__ == "__main__":
+    model_file = export_onnx()
+    print(f"\nSet USE_ONNX=1 to embed with {model_file}")
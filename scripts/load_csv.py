@@ -6,7 +6,6 @@ and prepares it for chunking. Uses pandas for efficient CSV handling.
 """
 
 import pandas as pd
-import re
 from pathlib import Path
 import sys
 
@@ -28,13 +27,8 @@ def normalize_whitespace(text):
     """
     if pd.isna(text) or text == "":
         return ""
-    # Convert to string if not already
-    text = str(text)
-    # Replace multiple whitespace with single space
-    text = re.sub(r'\s+', ' ', text)
-    # Strip leading/trailing whitespace
-    text = text.strip()
-    return text
+    # Splitting on whitespace and rejoining collapses runs and strips the ends
+    return ' '.join(str(text).split())
 
 
 def load_notes():
@@ -58,8 +52,10 @@ def load_notes():
     if 'text' not in df.columns:
         raise ValueError("CSV file must contain 'text' column")
     
-    # Normalize whitespace in text
-    df['text_clean'] = df['text'].apply(normalize_whitespace)
+    # Normalize whitespace in text (vectorized equivalent of normalize_whitespace)
+    df['text_clean'] = (
+        df['text'].astype('string').str.split().str.join(' ').fillna('')
+    )
     
     # Remove empty notes
     df = df[df['text_clean'] != ""]
@@ -0,0 +1,123 @@
+"""
+Persistent cache of query embeddings.
+
+Embedding the query is the most expensive step of a single retrieval, and
+users often repeat the same questions. This module stores query embeddings
+in a small SQLite database keyed by a SHA-256 hash of the model name and
+query text, evicting the least recently used entries past a size cap.
+"""
+
+import hashlib
+import sqlite3
+import time
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import (
+    QUERY_CACHE_FILE,
+    QUERY_CACHE_MAX_ENTRIES,
+    EMBEDDING_MODEL_NAME,
+    USE_ONNX
+)
+
+
+class QueryEmbeddingCache:
+    """
+    SQLite-backed LRU cache mapping query strings to embeddings.
+    """
+    
+    def __init__(self, path=QUERY_CACHE_FILE, max_entries=QUERY_CACHE_MAX_ENTRIES,
+                 clock=time.time_ns):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: Path to the SQLite file
+            max_entries: Maximum number of embeddings to keep
+            clock: Callable returning the current time as an integer, used
+                to record recency
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self.conn = sqlite3.connect(str(path))
+        # The cache is disposable, so trade durability for cheap commits;
+        # in WAL mode NORMAL skips the fsync on each recency update
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS q (h BLOB PRIMARY KEY, v BLOB, ts INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS q_ts ON q (ts)")
+        self.conn.commit()
+        
+        # Enforce the cap on open too, in case it was lowered since the last run
+        self.prune()
+    
+    def _key(self, query):
+        """Hash the query together with the model so a model change misses."""
+        backend = "onnx" if USE_ONNX else "torch"
+        return hashlib.sha256(
+            f"{EMBEDDING_MODEL_NAME}\0{backend}\0{query}".encode('utf-8')
+        ).digest()
+    
+    def get(self, query):
+        """
+        Look up a cached embedding.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            float32 array of shape (1, dimension), or None on a miss
+        """
+        h = self._key(query)
+        row = self.conn.execute("SELECT v FROM q WHERE h = ?", (h,)).fetchone()
+        if row is None:
+            return None
+        
+        # Refresh recency so frequently asked queries survive eviction
+        self.conn.execute("UPDATE q SET ts = ? WHERE h = ?", (self.clock(), h))
+        self.conn.commit()
+        return np.frombuffer(row[0], dtype='float32').reshape(1, -1).copy()
+    
+    def put(self, query, embedding):
+        """
+        Store an embedding for a query.
+        
+        Args:
+            query: Query string
+            embedding: Embedding array (any shape with a single row)
+        """
+        v = np.ascontiguousarray(embedding, dtype='float32').tobytes()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO q (h, v, ts) VALUES (?, ?, ?)",
+            (self._key(query), v, self.clock())
+        )
+        self.conn.commit()
+        
+        # The cap is checked against the table itself, so it holds across
+        # short-lived processes that each insert only a few queries
+        count = self.conn.execute("SELECT COUNT(*) FROM q").fetchone()[0]
+        if count > self.max_entries:
+            self.prune()
+    
+    def prune(self):
+        """
+        Delete the least recently used rows beyond max_entries.
+        
+        Rows with equal timestamps are ordered by rowid, which INSERT OR
+        REPLACE advances, so the most recently inserted one survives.
+        """
+        self.conn.execute(
+            "DELETE FROM q WHERE h IN "
+            "(SELECT h FROM q ORDER BY ts DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.conn.commit()
+    
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
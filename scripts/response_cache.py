@@ -0,0 +1,167 @@
+"""
+Semantic cache of generated responses.
+
+Many queries are re-asked with slightly different wording. This module keeps
+the embeddings of past queries in a small FAISS inner-product index next to
+the responses they produced, so a sufficiently similar query in the same mode
+can be answered without calling Gemini again.
+"""
+
+import json
+import os
+import time
+import numpy as np
+import faiss
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import (
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL_DAYS,
+    EMBEDDING_DIMENSION,
+    FAISS_INDEX_FILE
+)
+
+
+class SemanticResponseCache:
+    """
+    Response cache keyed by cosine similarity of query embeddings.
+    """
+    
+    # Nearest cached queries to inspect when looking for a match in the same mode
+    SEARCH_K = 10
+    
+    def __init__(self, cache_dir=RESPONSE_CACHE_DIR,
+                 threshold=RESPONSE_CACHE_THRESHOLD,
+                 ttl_days=RESPONSE_CACHE_TTL_DAYS):
+        """
+        Load the cache from disk, dropping expired entries and entries
+        generated against an older build of the notes index.
+        
+        Args:
+            cache_dir: Directory holding the cache index and entries
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_days: Maximum age of a usable entry in days
+        """
+        self.index_file = Path(cache_dir) / "queries.faiss"
+        self.entries_file = Path(cache_dir) / "entries.json"
+        self.threshold = threshold
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        
+        self.index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+        self.entries = []
+        
+        if self.index_file.exists() and self.entries_file.exists():
+            try:
+                self._load()
+            except Exception as e:
+                # A damaged cache must never block startup; start empty
+                print(f"Ignoring unreadable response cache: {e}")
+                self.index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+                self.entries = []
+    
+    @staticmethod
+    def _index_version():
+        """Identify the current notes index build by its file's mtime."""
+        try:
+            return FAISS_INDEX_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def _is_current(self, entry, cutoff):
+        """Whether an entry is within the TTL and from the current index build."""
+        return (entry['created_at'] >= cutoff
+                and entry.get('index_version') == self._index_version())
+    
+    def _load(self):
+        """Read the cache from disk and rebuild it without expired entries."""
+        stored = faiss.read_index(str(self.index_file))
+        with open(self.entries_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        
+        if stored.ntotal != len(entries) or stored.d != EMBEDDING_DIMENSION:
+            # Index and entries are out of sync; start over
+            return
+        
+        cutoff = time.time() - self.ttl_seconds
+        keep = [i for i, entry in enumerate(entries) if self._is_current(entry, cutoff)]
+        if keep:
+            vectors = stored.reconstruct_n(0, stored.ntotal)[keep]
+            self.index.add(vectors)
+        self.entries = [entries[i] for i in keep]
+    
+    def _save(self):
+        """Write the cache to disk, replacing each file atomically."""
+        index_tmp = self.index_file.with_name(self.index_file.name + ".tmp")
+        faiss.write_index(self.index, str(index_tmp))
+        fd = os.open(index_tmp, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        
+        entries_tmp = self.entries_file.with_name(self.entries_file.name + ".tmp")
+        with open(entries_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        # A crash between the two replaces leaves the files with different
+        # lengths, which _load detects and discards
+        os.replace(index_tmp, self.index_file)
+        os.replace(entries_tmp, self.entries_file)
+    
+    def lookup(self, query_embedding, mode, top_k):
+        """
+        Find a cached response for a similar query.
+        
+        Args:
+            query_embedding: L2-normalized float32 array of shape (1, dimension)
+            mode: Prompt mode the response must have been generated with
+            top_k: Number of retrieved chunks the response must have used
+            
+        Returns:
+            Tuple of (response_text, saved_filepath), or None on a miss
+        """
+        if self.index.ntotal == 0:
+            return None
+        
+        k = min(self.SEARCH_K, self.index.ntotal)
+        similarities, indices = self.index.search(query_embedding, k)
+        cutoff = time.time() - self.ttl_seconds
+        
+        for similarity, idx in zip(similarities[0], indices[0]):
+            if similarity < self.threshold:
+                break
+            entry = self.entries[idx]
+            if (entry['mode'] == mode and entry['top_k'] == top_k
+                    and self._is_current(entry, cutoff)):
+                saved_path = Path(entry['saved_path']) if entry['saved_path'] else None
+                return entry['response_text'], saved_path
+        
+        return None
+    
+    def add(self, query_embedding, mode, top_k, response_text, saved_path):
+        """
+        Add a generated response to the cache and persist it.
+        
+        Args:
+            query_embedding: L2-normalized float32 array of shape (1, dimension)
+            mode: Prompt mode used to generate the response
+            top_k: Number of retrieved chunks used
+            response_text: Response text from Gemini
+            saved_path: Path the response was saved to
+        """
+        self.index.add(np.ascontiguousarray(query_embedding, dtype='float32'))
+        self.entries.append({
+            'mode': mode,
+            'top_k': top_k,
+            'response_text': response_text,
+            'saved_path': str(saved_path) if saved_path else None,
+            'created_at': time.time(),
+            'index_version': self._index_version()
+        })
+        self._save()
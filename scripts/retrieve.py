@@ -5,7 +5,8 @@ This script embeds a query, searches the FAISS index, and returns
 the most relevant chunks with their metadata.
 """
 
-import json
+import os
+import sqlite3
 import numpy as np
 import faiss
 from pathlib import Path
@@ -15,12 +16,16 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.settings import (
     FAISS_INDEX_FILE,
-    CHUNK_METADATA_FILE,
-    EMBEDDING_MODEL_NAME,
-    TOP_K
+    EMBEDDING_VECTORS_FILE,
+    CHUNK_METADATA_DB,
+    TOP_K,
+    QUERY_BATCH_SIZE,
+    HNSW_EF_SEARCH,
+    IVF_NPROBE
 )
 
-from sentence_transformers import SentenceTransformer
+from scripts.embedding_model import load_embedding_model
+from scripts.query_cache import QueryEmbeddingCache
 
 
 class Retriever:
@@ -29,8 +34,8 @@ class Retriever:
     """
     
     def __init__(self):
-        """Initialize retriever with FAISS index and embedding model."""
-        print("Loading FAISS index and embedding model...")
+        """Initialize retriever with FAISS index; the embedding model loads on first use."""
+        print("Loading FAISS index...")
         
         if not FAISS_INDEX_FILE.exists():
             raise FileNotFoundError(
@@ -38,56 +43,182 @@ class Retriever:
                 "Please run build_embeddings.py first."
             )
         
-        if not CHUNK_METADATA_FILE.exists():
+        if not CHUNK_METADATA_DB.exists():
             raise FileNotFoundError(
-                f"Metadata file not found: {CHUNK_METADATA_FILE}\n"
+                f"Metadata database not found: {CHUNK_METADATA_DB}\n"
                 "Please run build_embeddings.py first."
             )
         
-        # Load FAISS index
-        self.index = faiss.read_index(str(FAISS_INDEX_FILE))
+        # Let FAISS parallelize multi-query searches across all cores
+        faiss.omp_set_num_threads(os.cpu_count())
         
-        # Load metadata
-        with open(CHUNK_METADATA_FILE, 'r', encoding='utf-8') as f:
-            self.metadata = json.load(f)
+        # Load FAISS index, preferring the memory-mapped vectors of a flat
+        # index since they stay in the OS page cache between runs
+        if EMBEDDING_VECTORS_FILE.exists():
+            vectors = np.load(EMBEDDING_VECTORS_FILE, mmap_mode='r').astype('float32')
+            self.index = faiss.IndexFlatIP(vectors.shape[1])
+            self.index.add(vectors)
+        else:
+            self.index = faiss.read_index(str(FAISS_INDEX_FILE))
+        if hasattr(self.index, 'hnsw'):
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
+        if hasattr(self.index, 'nprobe'):
+            self.index.nprobe = IVF_NPROBE
         
-        # Load embedding model
-        self.model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        # Load metadata into per-field arrays indexed by FAISS id
+        self._load_metadata()
+        
+        # Embedding model, loaded by the model property on first use
+        self._model = None
+        
+        # Cache of previously embedded queries
+        self.query_cache = QueryEmbeddingCache()
         
         print(f"Retriever initialized with {self.index.ntotal} vectors")
     
-    def retrieve(self, query, top_k=TOP_K):
+    @property
+    def model(self):
+        """Embedding model, imported and loaded on first access."""
+        if self._model is None:
+            self._model = load_embedding_model()
+        return self._model
+    
+    def _load_metadata(self):
+        """
+        Read chunk metadata into parallel arrays indexed by FAISS id.
+        
+        Lookups during retrieval are then plain array indexing instead of
+        per-query database reads or dictionary lookups.
+        """
+        conn = sqlite3.connect(f"{CHUNK_METADATA_DB.as_uri()}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT faiss_id, chunk_id, original_index, text, created_at, modified_at "
+                "FROM meta"
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        n = self.index.ntotal
+        self.texts = np.empty(n, dtype=object)
+        self.chunk_ids = np.empty(n, dtype=object)
+        self.original_indices = np.empty(n, dtype=object)
+        self.created_at = np.empty(n, dtype=object)
+        self.modified_at = np.empty(n, dtype=object)
+        
+        for faiss_id, chunk_id, original_index, text, created_at, modified_at in rows:
+            if faiss_id < n:
+                self.texts[faiss_id] = text
+                self.chunk_ids[faiss_id] = chunk_id
+                self.original_indices[faiss_id] = original_index
+                self.created_at[faiss_id] = created_at
+                self.modified_at[faiss_id] = modified_at
+    
+    def embed_query(self, query):
+        """
+        Embed a query, reusing a cached embedding when available.
+        
+        Args:
+            query: Search query string
+            
+        Returns:
+            L2-normalized float32 array of shape (1, dimension)
+        """
+        query_embedding = self.query_cache.get(query)
+        if query_embedding is None:
+            query_embedding = self.model.encode([query])
+            query_embedding = np.array(query_embedding).astype('float32')
+            faiss.normalize_L2(query_embedding)
+            self.query_cache.put(query, query_embedding)
+        return query_embedding
+    
+    def retrieve(self, query, top_k=TOP_K, query_embedding=None):
         """
         Retrieve top-k most relevant chunks for a query.
         
         Args:
             query: Search query string
             top_k: Number of chunks to retrieve
+            query_embedding: Precomputed output of embed_query, if available
             
         Returns:
             List of dictionaries containing chunk text and metadata
         """
-        # Embed query
-        query_embedding = self.model.encode([query])
-        query_embedding = np.array(query_embedding).astype('float32')
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
         
         # Search FAISS index
         distances, indices = self.index.search(query_embedding, min(top_k, self.index.ntotal))
         
-        # Retrieve chunks with metadata
+        return self._build_results(indices[0], distances[0])
+    
+    def retrieve_batch(self, queries, top_k=TOP_K):
+        """
+        Retrieve top-k most relevant chunks for several queries at once.
+        
+        Queries are looked up in the query embedding cache first; the misses
+        are embedded in one model call, and all queries are searched in one
+        FAISS call, which parallelizes across queries.
+        
+        Args:
+            queries: List of search query strings
+            top_k: Number of chunks to retrieve per query
+            
+        Returns:
+            List of result lists, one per query, in the same order as queries
+        """
+        if not queries:
+            return []
+        
+        cached = [self.query_cache.get(query) for query in queries]
+        misses = [i for i, embedding in enumerate(cached) if embedding is None]
+        
+        if misses:
+            encoded = self.model.encode(
+                [queries[i] for i in misses],
+                batch_size=QUERY_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype('float32')
+            for i, embedding in zip(misses, encoded):
+                cached[i] = embedding.reshape(1, -1)
+                self.query_cache.put(queries[i], cached[i])
+        
+        query_embeddings = np.vstack(cached)
+        
+        distances, indices = self.index.search(query_embeddings, min(top_k, self.index.ntotal))
+        
+        return [
+            self._build_results(idx_row, dist_row)
+            for idx_row, dist_row in zip(indices, distances)
+        ]
+    
+    def _build_results(self, indices, similarities):
+        """
+        Combine FAISS search results for one query with chunk metadata.
+        
+        Args:
+            indices: FAISS ids returned for the query
+            similarities: Matching cosine similarities
+            
+        Returns:
+            List of dictionaries containing chunk text and metadata
+        """
+        # The index returns cosine similarity; report cosine distance so
+        # lower still means more relevant
         results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            chunk_meta = self.metadata.get(str(idx))
-            if chunk_meta:
-                result = {
-                    'text': chunk_meta['text'],
-                    'chunk_id': chunk_meta['chunk_id'],
-                    'original_index': chunk_meta['original_index'],
-                    'created_at': chunk_meta.get('created_at'),
-                    'modified_at': chunk_meta.get('modified_at'),
-                    'distance': float(distance)
-                }
-                results.append(result)
+        for idx, similarity in zip(indices, similarities):
+            # FAISS pads with -1 when it finds fewer than top_k results
+            if idx < 0 or self.texts[idx] is None:
+                continue
+            results.append({
+                'text': self.texts[idx],
+                'chunk_id': self.chunk_ids[idx],
+                'original_index': self.original_indices[idx],
+                'created_at': self.created_at[idx],
+                'modified_at': self.modified_at[idx],
+                'distance': float(1.0 - similarity)
+            })
         
         return results
 
@@ -0,0 +1,65 @@
+"""
+Tests for the on-disk query embedding cache.
+"""
+
+import itertools
+import sqlite3
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.query_cache import QueryEmbeddingCache
+
+
+def _row_count(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM q").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_cap_holds_across_short_lived_instances(tmp_path):
+    path = tmp_path / "query_cache.sqlite"
+    max_entries = 5
+    
+    # Each instance stands in for one CLI session asking a few new questions
+    for session in range(4):
+        cache = QueryEmbeddingCache(path=path, max_entries=max_entries)
+        for i in range(3):
+            cache.put(f"session {session} query {i}", np.full((1, 4), i, dtype='float32'))
+        cache.close()
+        assert _row_count(path) <= max_entries
+    
+    assert _row_count(path) == max_entries
+
+
+def test_prune_keeps_most_recent_queries(tmp_path):
+    path = tmp_path / "query_cache.sqlite"
+    # A strictly increasing clock keeps recency independent of timer resolution
+    clock = itertools.count().__next__
+    cache = QueryEmbeddingCache(path=path, max_entries=2, clock=clock)
+    cache.put("oldest", np.zeros((1, 4), dtype='float32'))
+    cache.put("middle", np.ones((1, 4), dtype='float32'))
+    cache.put("newest", np.full((1, 4), 2, dtype='float32'))
+    
+    assert cache.get("oldest") is None
+    assert cache.get("middle") is not None
+    np.testing.assert_array_equal(cache.get("newest"), np.full((1, 4), 2, dtype='float32'))
+    cache.close()
+
+
+def test_prune_breaks_timestamp_ties_by_insertion_order(tmp_path):
+    path = tmp_path / "query_cache.sqlite"
+    # A frozen clock makes every row tie on ts
+    cache = QueryEmbeddingCache(path=path, max_entries=2, clock=lambda: 0)
+    cache.put("first", np.zeros((1, 4), dtype='float32'))
+    cache.put("second", np.ones((1, 4), dtype='float32'))
+    cache.put("third", np.full((1, 4), 2, dtype='float32'))
+    
+    assert cache.get("first") is None
+    assert cache.get("second") is not None
+    assert cache.get("third") is not None
+    cache.close()